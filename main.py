@@ -1,54 +1,177 @@
+import atexit
+import copy
 import logging
+import logging.handlers
+import queue
+import random
 import time
 import os
-from datetime import datetime
-from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
+import hashlib
+import re
+import unicodedata
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
+import httpx
+import orjson
 import openai
+import redis
+import redis.asyncio as aioredis
+import zstandard
 from dotenv import load_dotenv
+from pythonjsonlogger import jsonlogger
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
+# Configure logging (defaults to WARNING; set LOG_LEVEL=INFO or DEBUG for more detail)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+# Fraction of successful requests logged by the request middleware (errors are always logged)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+log_formatter = jsonlogger.JsonFormatter('%(asctime)s %(name)s %(levelname)s %(message)s')
+file_handler = logging.FileHandler('app.log')
+file_handler.setFormatter(log_formatter)
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(log_formatter)
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves all formatting, including exceptions, to the listener's JSON formatter"""
+
+    def prepare(self, record):
+        # Merge args now (they may be mutated later) but keep exc_info so the
+        # traceback is rendered as a structured field rather than inside the message
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+# Records are handed to a background thread so disk/console writes never block the event loop
+log_queue = queue.Queue(-1)
+queue_handler = StructuredQueueHandler(log_queue)
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
+    level=LOG_LEVEL,
+    handlers=[queue_handler]
 )
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 logger = logging.getLogger(__name__)
 
 # OpenAI configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-logger.info(f"OPENAI_API_KEY: {OPENAI_API_KEY}")
+logger.info("OPENAI_API_KEY present: %s", bool(OPENAI_API_KEY))
 if not OPENAI_API_KEY:
     logger.warning("OPENAI_API_KEY not found in environment variables. OpenAI chat will be disabled.")
-    openai_client = None
-else:
-    openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-    logger.info("OpenAI client initialized successfully")
+
+# Redis configuration
+REDIS_URL = os.getenv("REDIS_URL")
+# Seconds to wait on Redis before treating the cache as a miss
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.1"))
+if not REDIS_URL:
+    logger.warning("REDIS_URL not found in environment variables. Using in-process response cache.")
+
+# Semantic (near-duplicate prompt) cache configuration
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_MAX_DISTANCE = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.05"))
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIM = 1536
+
+# Number of uvicorn worker processes (2n+1 by default)
+WORKERS = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create per-worker clients before serving and release them on shutdown"""
+    logger.info("=" * 50)
+    logger.info("Simple Chat API is starting up...")
+    logger.info("Startup time: %s", time.strftime('%Y-%m-%d %H:%M:%S'))
+
+    # Shared connection pool so OpenAI calls reuse TLS sessions and HTTP/2 streams
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=httpx.Timeout(30.0, connect=5.0)
+    )
+
+    if OPENAI_API_KEY:
+        app.state.openai = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=app.state.http)
+        logger.info("OpenAI integration: ENABLED")
+    else:
+        app.state.openai = None
+        logger.warning("OpenAI integration: DISABLED (no API key)")
+
+    if REDIS_URL:
+        app.state.redis = aioredis.from_url(
+            REDIS_URL,
+            socket_timeout=REDIS_TIMEOUT,
+            socket_connect_timeout=REDIS_TIMEOUT
+        )
+    else:
+        app.state.redis = None
+    cache.redis = app.state.redis
+    logger.info("Response cache: %s", 'redis' if app.state.redis else 'memory')
+
+    if SEMANTIC_CACHE_ENABLED:
+        app.state.semantic_cache = SemanticCache(max_distance=SEMANTIC_CACHE_MAX_DISTANCE, ttl_seconds=cache.ttl_seconds)
+        logger.info("Semantic cache: ENABLED")
+    else:
+        app.state.semantic_cache = None
+    logger.info("=" * 50)
+
+    yield
+
+    logger.info("=" * 50)
+    logger.info("Simple Chat API is shutting down...")
+    if app.state.openai:
+        await app.state.openai.close()
+    if app.state.redis:
+        await app.state.redis.aclose()
+    await app.state.http.aclose()
+    logger.info("Shutdown time: %s", time.strftime('%Y-%m-%d %H:%M:%S'))
+    logger.info("=" * 50)
 
 # Create FastAPI instance
 app = FastAPI(
     title="Simple Chat API",
     description="A simple API that responds to messages with both simple responses and OpenAI integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Define the request models
 class MessageRequest(BaseModel):
+    model_config = ConfigDict(strict=True, extra="forbid", frozen=True)
+
     message: str
 
 class OpenAIChatRequest(BaseModel):
+    model_config = ConfigDict(strict=True, extra="forbid", frozen=True)
+
     message: str
-    model: Optional[str] = "gpt-3.5-turbo"
-    max_tokens: Optional[int] = 150
-    temperature: Optional[float] = 0.7
+    model: str = "gpt-3.5-turbo"
+    max_tokens: int = Field(150, ge=1, le=4096)
+    temperature: float = Field(0.7, ge=0, le=2)
+    stream: bool = False
+
+def _normalize(s: str) -> str:
+    """Canonical form of a message for intent matching and cache keys"""
+    return unicodedata.normalize("NFKC", s).strip().casefold()
+
+# Intent matcher for the simple chat endpoint, applied to normalized messages;
+# each named group is one intent
+INTENTS = re.compile(r'^(?:(?P<greet>hello|hi)|(?P<bye>bye|goodbye)|(?P<how>how are you))$')
+
+# Canned replies keyed by intent name
+RESPONSES = {
+    "how": "I am fine",
+    "greet": "Hello! How can I help you?",
+    "bye": "Goodbye! Have a great day!",
+}
 
 # Define the response models
 class MessageResponse(BaseModel):
@@ -61,52 +184,231 @@ class OpenAIChatResponse(BaseModel):
     model_used: str
     tokens_used: Optional[int] = None
 
+# Cache for deterministic OpenAI responses (Redis when configured, in-process otherwise)
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+class LLMCache:
+    """Cache for OpenAI chat responses with a per-entry TTL, shared across workers via Redis"""
+
+    def __init__(self, ttl_seconds: int = 1800, redis_client=None, compress_threshold: int = 1024, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.redis = redis_client
+        self.compress_threshold = compress_threshold
+        self.hits = 0
+        self.misses = 0
+        # Least recently used entries first; bounded by max_entries
+        self._cache: OrderedDict[str, tuple[OpenAIChatResponse, float]] = OrderedDict()
+
+    def _key(self, model: str, message: str, max_tokens: Optional[int], temperature: Optional[float]) -> str:
+        blob = orjson.dumps(
+            {"model": model, "message": _normalize(message), "max_tokens": max_tokens, "temperature": temperature},
+            option=orjson.OPT_SORT_KEYS
+        )
+        return "oai:" + hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+    def _encode(self, response_obj: OpenAIChatResponse) -> bytes:
+        payload = orjson.dumps(response_obj.model_dump())
+        if len(payload) > self.compress_threshold:
+            return zstandard.ZstdCompressor().compress(payload)
+        return payload
+
+    def _decode(self, raw: bytes) -> OpenAIChatResponse:
+        if raw.startswith(ZSTD_MAGIC):
+            raw = zstandard.ZstdDecompressor().decompress(raw)
+        return OpenAIChatResponse(**orjson.loads(raw))
+
+    async def _lookup(self, key: str) -> Optional[OpenAIChatResponse]:
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(key)
+            except redis.RedisError as e:
+                logger.warning("Redis cache lookup failed: %s", e)
+                return None
+            if raw is None:
+                return None
+            try:
+                return self._decode(raw)
+            except (zstandard.ZstdError, ValueError, TypeError) as e:
+                # Corrupt or foreign values under our key prefix are treated as misses
+                logger.warning("Redis cache entry %s could not be decoded: %s", key, e)
+                return None
+
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        response_obj, expires_at = entry
+        if time.time() >= expires_at:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return response_obj
+
+    async def get(self, model: str, message: str, max_tokens: Optional[int], temperature: Optional[float]) -> Optional[OpenAIChatResponse]:
+        response_obj = await self._lookup(self._key(model, message, max_tokens, temperature))
+        if response_obj is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response_obj
+
+    async def set(self, model: str, message: str, max_tokens: Optional[int], temperature: Optional[float], response_obj: OpenAIChatResponse) -> None:
+        key = self._key(model, message, max_tokens, temperature)
+        if self.redis is not None:
+            try:
+                await self.redis.setex(key, self.ttl_seconds, self._encode(response_obj))
+            except redis.RedisError as e:
+                logger.warning("Redis cache store failed: %s", e)
+            return
+        self._cache[key] = (response_obj, time.time() + self.ttl_seconds)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+cache = LLMCache()
+
+class SemanticCache:
+    """Per-worker nearest-neighbour cache over prompt embeddings for near-duplicate OpenAI requests"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, max_distance: float = 0.05, max_elements: int = 10000, ttl_seconds: int = 1800):
+        self.max_distance = max_distance
+        self.max_elements = max_elements
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        # Imported here so hnswlib (a compiled extension) is only needed when the cache is enabled
+        import hnswlib
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        # Deleted slots are reused, so the index never has to grow past max_elements
+        self._index.init_index(max_elements=max_elements, ef_construction=200, M=16, allow_replace_deleted=True)
+        self._next_label = 0
+        # Live entries by index label, oldest first
+        self._entries: OrderedDict[int, tuple[str, int, OpenAIChatResponse, float]] = OrderedDict()
+
+    def _remove(self, label: int) -> None:
+        self._index.mark_deleted(label)
+        del self._entries[label]
+
+    def get(self, embedding: list[float], model: str, max_tokens: int) -> Optional[OpenAIChatResponse]:
+        if not self._entries:
+            return None
+        labels, distances = self._index.knn_query(embedding, k=1)
+        if distances[0][0] >= self.max_distance:
+            return None
+        label = int(labels[0][0])
+        entry_model, entry_max_tokens, response_obj, expires_at = self._entries[label]
+        if time.time() >= expires_at:
+            self._remove(label)
+            return None
+        # A close prompt only counts if it was answered with the same generation settings
+        if entry_model != model or entry_max_tokens != max_tokens:
+            return None
+        self.hits += 1
+        return response_obj
+
+    def add(self, embedding: list[float], model: str, max_tokens: int, response_obj: OpenAIChatResponse) -> None:
+        # Make room by dropping the oldest entry once the index is full
+        while len(self._entries) >= self.max_elements:
+            self._remove(next(iter(self._entries)))
+        label = self._next_label
+        self._next_label += 1
+        self._index.add_items([embedding], [label], replace_deleted=True)
+        self._entries[label] = (model, max_tokens, response_obj, time.time() + self.ttl_seconds)
+
+async def embed_message(openai_client, message: str) -> Optional[list[float]]:
+    """Embed a prompt for the semantic cache, or return None if the embedding call fails"""
+    try:
+        result = await openai_client.embeddings.create(model=EMBEDDING_MODEL, input=message)
+    except openai.APIError as e:
+        logger.warning("Embedding request failed: %s", e)
+        return None
+    return result.data[0].embedding
+
+async def cache_response(
+    request: OpenAIChatRequest,
+    input_message: str,
+    response_obj: OpenAIChatResponse,
+    semantic_cache: Optional[SemanticCache] = None,
+    embedding: Optional[list[float]] = None
+) -> None:
+    """Store a fresh OpenAI response in the exact-match cache and, if embedded, the semantic cache"""
+    await cache.set(request.model, input_message, request.max_tokens, request.temperature, response_obj)
+    if semantic_cache is not None and embedding is not None:
+        semantic_cache.add(embedding, request.model, request.max_tokens, response_obj)
+
 # Middleware for request logging
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Middleware to log all incoming requests"""
-    start_time = time.time()
+    """Middleware to log failed requests and a sample of successful ones"""
+    # Health probes are high-volume and carry no useful request detail
+    if request.url.path == "/health":
+        return await call_next(request)
     
-    # Log request details
-    logger.info(f"Request started: {request.method} {request.url}")
-    logger.info(f"Client IP: {request.client.host if request.client else 'Unknown'}")
-    logger.info(f"User Agent: {request.headers.get('user-agent', 'Unknown')}")
+    start_time = time.perf_counter()
     
     # Process the request
     response = await call_next(request)
     
     # Calculate processing time
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     
-    # Log response details
-    logger.info(f"Request completed: {request.method} {request.url} - Status: {response.status_code} - Duration: {process_time:.4f}s")
+    # Log every error response, but only a sample of successful ones
+    if response.status_code >= 500:
+        level = logging.ERROR
+    elif response.status_code >= 400:
+        level = logging.WARNING
+    elif random.random() < LOG_SAMPLE_RATE:
+        level = logging.INFO
+    else:
+        level = None
+    
+    if level is not None:
+        logger.log(
+            level,
+            "request_completed",
+            extra={
+                "method": request.method,
+                "url": str(request.url),
+                "status": response.status_code,
+                "duration_ms": round(process_time * 1000, 3)
+            }
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "request_client",
+                extra={
+                    "client_ip": request.client.host if request.client else 'Unknown',
+                    "user_agent": request.headers.get('user-agent', 'Unknown')
+                }
+            )
     
     return response
 
-@app.on_event("startup")
-async def startup_event():
-    """Log when the application starts"""
-    logger.info("=" * 50)
-    logger.info("Simple Chat API is starting up...")
-    logger.info(f"Startup time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    if openai_client:
-        logger.info("OpenAI integration: ENABLED")
-    else:
-        logger.warning("OpenAI integration: DISABLED (no API key)")
-    logger.info("=" * 50)
+def get_health_status(state) -> dict:
+    """Build the health check payload from the per-worker app state"""
+    return {
+        "status": "healthy", 
+        "service": "Simple Chat API",
+        "openai_status": "enabled" if state.openai else "disabled",
+        "cache_backend": "redis" if state.redis else "memory",
+        # Counters are per worker process, even when the Redis cache is shared
+        "worker_cache_hits": cache.hits,
+        "worker_cache_misses": cache.misses,
+        "semantic_cache_hits": state.semantic_cache.hits if state.semantic_cache else 0
+    }
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Log when the application shuts down"""
-    logger.info("=" * 50)
-    logger.info("Simple Chat API is shutting down...")
-    logger.info(f"Shutdown time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    logger.info("=" * 50)
+# Registered after log_requests so it runs first and answers health probes
+# without request logging, routing or response model validation
+@app.middleware("http")
+async def fast_health(request: Request, call_next):
+    """Middleware that short-circuits GET /health"""
+    if request.url.path == "/health" and request.method == "GET":
+        return Response(orjson.dumps(get_health_status(request.app.state)), media_type="application/json")
+    return await call_next(request)
 
 @app.get("/")
 async def root():
     """Root endpoint"""
-    logger.info("Root endpoint accessed")
+    logger.info("root_accessed")
     return {"message": "Welcome to Simple Chat API"}
 
 @app.post("/chat", response_model=MessageResponse)
@@ -118,59 +420,99 @@ async def chat_endpoint(request: MessageRequest):
         request: MessageRequest object containing the input message
         
     Returns:
-        MessageResponse object with the response and original message
+        JSON body matching MessageResponse, returned as an ORJSONResponse so
+        FastAPI does not re-validate it against the response model
     """
     # Log the incoming request
-    logger.info(f"Simple chat endpoint called with message: '{request.message}'")
+    logger.info("chat_request", extra={"chat_message": request.message})
+    
+    # Get the input message
+    input_message = request.message.strip()
+    logger.debug("chat_processing", extra={"input_message": input_message})
     
+    # Simple response logic
+    match = INTENTS.match(_normalize(input_message))
+    if match:
+        response_text = RESPONSES[match.lastgroup]
+        logger.debug("chat_intent_matched", extra={"intent": match.lastgroup, "response": response_text})
+    else:
+        response_text = f"I received your message: '{input_message}'. How can I assist you?"
+        logger.debug("chat_echo", extra={"input_message": input_message})
+    
+    # Log successful response
+    logger.info("chat_response", extra={"original_message": input_message, "response": response_text})
+    
+    return ORJSONResponse({"response": response_text, "original_message": input_message})
+
+# Server-Sent Events helpers for streamed OpenAI responses
+SSE_DONE = b"data: [DONE]\n\n"
+
+def sse_event(payload: dict) -> bytes:
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+async def sse_cached(cached: OpenAIChatResponse):
+    """Replay a cached response as a single SSE delta"""
+    yield sse_event({"role": "assistant", "content": cached.response})
+    yield SSE_DONE
+
+async def sse_iter(
+    stream,
+    request: OpenAIChatRequest,
+    input_message: str,
+    cacheable: bool,
+    semantic_cache: Optional[SemanticCache] = None,
+    embedding: Optional[list[float]] = None
+):
+    """Forward OpenAI completion chunks as SSE events and cache the assembled text"""
+    parts = []
+    # Always release the pooled connection, including when the client disconnects mid-stream
     try:
-        # Get the input message
-        input_message = request.message.strip()
-        logger.info(f"Processing message: '{input_message}'")
-        
-        # Simple response logic
-        if input_message.lower() == "how are you":
-            response_text = "I am fine"
-            logger.info("Response: 'I am fine' (matched: 'how are you')")
-        elif input_message.lower() == "hello" or input_message.lower() == "hi":
-            response_text = "Hello! How can I help you?"
-            logger.info("Response: 'Hello! How can I help you?' (matched: 'hello/hi')")
-        elif input_message.lower() == "bye" or input_message.lower() == "goodbye":
-            response_text = "Goodbye! Have a great day!"
-            logger.info("Response: 'Goodbye! Have a great day!' (matched: 'bye/goodbye')")
-        else:
-            response_text = f"I received your message: '{input_message}'. How can I assist you?"
-            logger.info(f"Response: Echo response for unmatched message: '{input_message}'")
-        
-        # Create response object
-        response_obj = MessageResponse(
-            response=response_text,
-            original_message=input_message
-        )
-        
-        # Log successful response
-        logger.info(f"Successfully processed simple chat request. Original: '{input_message}' -> Response: '{response_text}'")
-        
-        return response_obj
-        
-    except Exception as e:
-        # Log the error
-        logger.error(f"Error processing simple chat request: {str(e)}", exc_info=True)
-        logger.error(f"Failed message: '{request.message}'")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                parts.append(delta.content)
+            yield sse_event(delta.model_dump(exclude_none=True))
+    except (openai.APIError, httpx.HTTPError) as e:
+        # Headers are already sent, so errors are reported in-band
+        logger.error("OpenAI streaming error: %s", e)
+        yield b"event: error\n" + sse_event({"detail": f"OpenAI API error: {str(e)}"})
+        return
+    finally:
+        await stream.close()
+    
+    ai_response = "".join(parts)
+    response_obj = OpenAIChatResponse(
+        response=ai_response,
+        original_message=input_message,
+        model_used=request.model
+    )
+    if cacheable:
+        await cache_response(request, input_message, response_obj, semantic_cache, embedding)
+    
+    logger.info(
+        "openai_chat_response",
+        extra={"original_message": input_message, "response": ai_response, "model": request.model, "stream": True}
+    )
+    yield SSE_DONE
 
 @app.post("/chat/openai", response_model=OpenAIChatResponse)
-async def openai_chat_endpoint(request: OpenAIChatRequest):
+async def openai_chat_endpoint(request: OpenAIChatRequest, http_request: Request):
     """
     POST endpoint that uses OpenAI to generate responses
     
     Args:
         request: OpenAIChatRequest object containing the input message and OpenAI parameters
+        http_request: Incoming request, used to reach the per-worker clients on app.state
         
     Returns:
-        OpenAIChatResponse object with the AI response and metadata
+        JSON body matching OpenAIChatResponse (returned as an ORJSONResponse so
+        FastAPI does not re-validate it), or a text/event-stream of completion
+        deltas when request.stream is set
     """
     # Check if OpenAI is available
+    openai_client = http_request.app.state.openai
     if not openai_client:
         logger.error("OpenAI chat endpoint called but OpenAI is not configured")
         raise HTTPException(
@@ -179,92 +521,136 @@ async def openai_chat_endpoint(request: OpenAIChatRequest):
         )
     
     # Log the incoming request
-    logger.info(f"OpenAI chat endpoint called with message: '{request.message}'")
-    logger.info(f"Model: {request.model}, Max tokens: {request.max_tokens}, Temperature: {request.temperature}")
+    logger.info("openai_chat_request", extra={"chat_message": request.message, "model": request.model})
+    logger.debug(
+        "openai_request_params",
+        extra={
+            "model": request.model,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            "stream": request.stream
+        }
+    )
     
+    # Get the input message
+    input_message = request.message.strip()
+    logger.debug("openai_processing", extra={"input_message": input_message})
+    
+    # Only deterministic requests are safe to serve from cache
+    cacheable = request.temperature == 0
+    semantic_cache = http_request.app.state.semantic_cache
+    embedding = None
+    if cacheable:
+        cached = await cache.get(request.model, input_message, request.max_tokens, request.temperature)
+        if cached is None and semantic_cache is not None:
+            embedding = await embed_message(openai_client, input_message)
+            if embedding is not None:
+                cached = semantic_cache.get(embedding, request.model, request.max_tokens)
+        if cached is not None:
+            logger.info("openai_cache_hit", extra={"original_message": input_message, "model": request.model})
+            if request.stream:
+                return StreamingResponse(sse_cached(cached), media_type="text/event-stream")
+            return ORJSONResponse({**cached.model_dump(), "original_message": input_message, "tokens_used": 0})
+    
+    # Call OpenAI API
+    logger.debug("openai_call", extra={"model": request.model})
     try:
-        # Get the input message
-        input_message = request.message.strip()
-        logger.info(f"Processing OpenAI message: '{input_message}'")
-        
-        # Call OpenAI API
-        logger.info(f"Calling OpenAI API with model: {request.model}")
-        
-        response = openai_client.chat.completions.create(
+        response = await openai_client.chat.completions.create(
             model=request.model,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant. Provide concise and friendly responses."},
                 {"role": "user", "content": input_message}
             ],
             max_tokens=request.max_tokens,
-            temperature=request.temperature
+            temperature=request.temperature,
+            stream=request.stream
         )
         
-        # Extract the response
-        ai_response = response.choices[0].message.content
-        tokens_used = response.usage.total_tokens if response.usage else None
-        
-        logger.info(f"OpenAI response received: '{ai_response}'")
-        logger.info(f"Tokens used: {tokens_used}")
-        
-        # Create response object
-        response_obj = OpenAIChatResponse(
-            response=ai_response,
-            original_message=input_message,
-            model_used=request.model,
-            tokens_used=tokens_used
-        )
-        
-        # Log successful response
-        logger.info(f"Successfully processed OpenAI chat request. Original: '{input_message}' -> Response: '{ai_response}'")
-        
-        return response_obj
-        
     except openai.AuthenticationError as e:
-        logger.error(f"OpenAI authentication error: {str(e)}")
+        logger.error("OpenAI authentication error: %s", e)
         raise HTTPException(status_code=401, detail="OpenAI authentication failed. Please check your API key.")
     
     except openai.RateLimitError as e:
-        logger.error(f"OpenAI rate limit error: {str(e)}")
+        logger.error("OpenAI rate limit error: %s", e)
         raise HTTPException(status_code=429, detail="OpenAI rate limit exceeded. Please try again later.")
     
     except openai.APIError as e:
-        logger.error(f"OpenAI API error: {str(e)}")
+        logger.error("OpenAI API error: %s", e)
         raise HTTPException(status_code=502, detail=f"OpenAI API error: {str(e)}")
     
     except Exception as e:
-        # Log the error
-        logger.error(f"Error processing OpenAI chat request: {str(e)}", exc_info=True)
-        logger.error(f"Failed message: '{request.message}'")
+        # Only format the traceback when debugging
+        logger.error("Error processing OpenAI chat request: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+        logger.error("Failed message: '%s'", request.message)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    logger.info("Health check endpoint accessed")
     
-    health_status = {
-        "status": "healthy", 
-        "service": "Simple Chat API",
-        "openai_status": "enabled" if openai_client else "disabled"
-    }
+    if request.stream:
+        return StreamingResponse(
+            sse_iter(response, request, input_message, cacheable, semantic_cache, embedding),
+            media_type="text/event-stream"
+        )
     
-    return health_status
+    # Extract the response
+    ai_response = response.choices[0].message.content
+    tokens_used = response.usage.total_tokens if response.usage else None
+    
+    logger.debug("openai_response_received", extra={"response": ai_response, "tokens_used": tokens_used})
+    
+    # Create response object
+    response_obj = OpenAIChatResponse(
+        response=ai_response,
+        original_message=input_message,
+        model_used=request.model,
+        tokens_used=tokens_used
+    )
+    
+    if cacheable:
+        await cache_response(request, input_message, response_obj, semantic_cache, embedding)
+    
+    # Log successful response
+    logger.info(
+        "openai_chat_response",
+        extra={
+            "original_message": input_message,
+            "response": ai_response,
+            "model": request.model,
+            "tokens_used": tokens_used
+        }
+    )
+    
+    return ORJSONResponse(response_obj.model_dump())
+
+@app.get("/health")
+async def health_check(request: Request):
+    """Health check endpoint (GET requests are normally answered by the fast_health middleware)"""
+    return get_health_status(request.app.state)
 
 # Exception handler for unhandled exceptions
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler to log all unhandled exceptions"""
-    logger.error(f"Unhandled exception occurred: {str(exc)}", exc_info=True)
-    logger.error(f"Request URL: {request.url}")
-    logger.error(f"Request method: {request.method}")
-    return {"error": "Internal server error", "detail": str(exc)}
+    logger.error("Unhandled exception occurred: %s", exc, exc_info=True)
+    logger.error("Request URL: %s", request.url)
+    logger.error("Request method: %s", request.method)
+    return ORJSONResponse({"error": "Internal server error", "detail": str(exc)}, status_code=500)
 
 if __name__ == "__main__":
     import uvicorn
     
     logger.info("Starting FastAPI server with uvicorn...")
+    logger.info("Worker processes: %s", WORKERS)
     logger.info("Server will be available at: http://localhost:8000")
     logger.info("API documentation will be available at: http://localhost:8000/docs")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # The app is passed as an import string so uvicorn can spawn multiple workers;
+    # loop="auto" uses uvloop where it is installed (not on Windows) and asyncio otherwise;
+    # log_config=None keeps uvicorn from replacing the logging setup above
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=WORKERS,
+        loop="auto",
+        http="httptools",
+        log_config=None
+    ) 
\ No newline at end of file
@@ -0,0 +1,388 @@
+import asyncio
+import math
+import sys
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
+
+import main
+
+
+class FakeStream:
+    """Stand-in for openai.AsyncStream yielding the given chunks (or raising an error)"""
+
+    def __init__(self, deltas, error=None):
+        self.chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=d)]) for d in deltas]
+        self.error = error
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    def __init__(self, content="Hi there!"):
+        self.content = content
+        self.calls = 0
+
+    async def create(self, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return FakeStream([ChoiceDelta(role="assistant", content="Hi "), ChoiceDelta(content="there!")])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))],
+            usage=SimpleNamespace(total_tokens=12)
+        )
+
+
+class FakeEmbeddings:
+    """Returns fixed vectors per message, or raises for messages mapped to an exception"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def create(self, model, input):
+        vector = self.vectors[input]
+        if isinstance(vector, Exception):
+            raise vector
+        return SimpleNamespace(data=[SimpleNamespace(embedding=vector)])
+
+
+class FakeOpenAI:
+    def __init__(self, content="Hi there!", vectors=None):
+        self.chat = SimpleNamespace(completions=FakeCompletions(content))
+        self.embeddings = FakeEmbeddings(vectors or {})
+
+    async def close(self):
+        pass
+
+
+class FakeIndex:
+    """Brute-force stand-in for hnswlib.Index (cosine space) covering the calls SemanticCache makes"""
+
+    def __init__(self, space, dim):
+        self.items = {}
+        self.deleted = set()
+
+    def init_index(self, max_elements, **kwargs):
+        self.max_elements = max_elements
+
+    def add_items(self, data, ids, replace_deleted=False):
+        live = len(self.items) - len(self.deleted)
+        assert live < self.max_elements, "index full"
+        if replace_deleted and self.deleted:
+            del self.items[self.deleted.pop()]
+        for vector, label in zip(data, ids):
+            self.items[label] = vector
+
+    def mark_deleted(self, label):
+        self.deleted.add(label)
+
+    def knn_query(self, data, k):
+        def distance(a, b):
+            dot = sum(x * y for x, y in zip(a, b))
+            return 1 - dot / (math.hypot(*a) * math.hypot(*b))
+
+        live = [label for label in self.items if label not in self.deleted]
+        label = min(live, key=lambda l: distance(self.items[l], data))
+        return [[label]], [[distance(self.items[label], data)]]
+
+
+@pytest.fixture
+def fake_hnswlib(monkeypatch):
+    """Install a pure-Python hnswlib so the semantic cache is testable without the C++ extension"""
+    monkeypatch.setitem(sys.modules, "hnswlib", SimpleNamespace(Index=FakeIndex))
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    """Give every test an empty in-process response cache"""
+    monkeypatch.setattr(main, "cache", main.LLMCache())
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "OPENAI_API_KEY", None)
+    monkeypatch.setattr(main, "REDIS_URL", None)
+    monkeypatch.setattr(main, "SEMANTIC_CACHE_ENABLED", False)
+    with TestClient(main.app, raise_server_exceptions=False) as test_client:
+        yield test_client
+
+
+def collect(agen):
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+
+def make_response(message="Hello"):
+    return main.OpenAIChatResponse(response="Hi!", original_message=message, model_used="gpt-3.5-turbo", tokens_used=5)
+
+
+def test_cache_hit_uses_normalized_message():
+    cache = main.LLMCache()
+    asyncio.run(cache.set("gpt-3.5-turbo", "Hello", 150, 0.0, make_response()))
+
+    cached = asyncio.run(cache.get("gpt-3.5-turbo", "  HELLO ", 150, 0.0))
+
+    assert cached is not None and cached.response == "Hi!"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_cache_hit_and_miss_counters():
+    cache = main.LLMCache()
+    asyncio.run(cache.set("gpt-3.5-turbo", "Hello", 150, 0.0, make_response()))
+
+    assert asyncio.run(cache.get("gpt-3.5-turbo", "Hello", 150, 0.0)).response == "Hi!"
+    assert asyncio.run(cache.get("gpt-3.5-turbo", "Bye", 150, 0.0)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_miss_on_different_parameters():
+    cache = main.LLMCache()
+    asyncio.run(cache.set("gpt-3.5-turbo", "Hello", 150, 0.0, make_response()))
+
+    assert asyncio.run(cache.get("gpt-4", "Hello", 150, 0.0)) is None
+    assert asyncio.run(cache.get("gpt-3.5-turbo", "Hello", 50, 0.0)) is None
+
+
+def test_cache_entry_expires():
+    cache = main.LLMCache(ttl_seconds=0)
+    asyncio.run(cache.set("gpt-3.5-turbo", "Hello", 150, 0.0, make_response()))
+
+    assert asyncio.run(cache.get("gpt-3.5-turbo", "Hello", 150, 0.0)) is None
+    assert len(cache._cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = main.LLMCache(max_entries=2)
+    for message in ("a", "b"):
+        asyncio.run(cache.set("gpt-3.5-turbo", message, 150, 0.0, make_response(message)))
+    asyncio.run(cache.get("gpt-3.5-turbo", "a", 150, 0.0))
+    asyncio.run(cache.set("gpt-3.5-turbo", "c", 150, 0.0, make_response("c")))
+
+    assert asyncio.run(cache.get("gpt-3.5-turbo", "a", 150, 0.0)) is not None
+    assert asyncio.run(cache.get("gpt-3.5-turbo", "b", 150, 0.0)) is None
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.store[key] = value
+
+
+def test_redis_cache_round_trips_compressed_entries():
+    cache = main.LLMCache(redis_client=FakeRedis(), compress_threshold=10)
+    asyncio.run(cache.set("gpt-3.5-turbo", "Hello", 150, 0.0, make_response()))
+
+    (stored,) = cache.redis.store.values()
+    assert stored.startswith(main.ZSTD_MAGIC)
+    assert asyncio.run(cache.get("gpt-3.5-turbo", "Hello", 150, 0.0)) == make_response()
+
+
+@pytest.mark.parametrize("raw", [b"not json", main.ZSTD_MAGIC + b"garbage", b'{"unexpected": 1}', b"[1, 2]"])
+def test_redis_cache_treats_undecodable_entries_as_misses(raw):
+    cache = main.LLMCache(redis_client=FakeRedis())
+    cache.redis.store[cache._key("gpt-3.5-turbo", "Hello", 150, 0.0)] = raw
+
+    assert asyncio.run(cache.get("gpt-3.5-turbo", "Hello", 150, 0.0)) is None
+    assert cache.misses == 1
+
+
+def test_semantic_cache_hits_within_distance_threshold(fake_hnswlib):
+    cache = main.SemanticCache(max_distance=0.05)
+    cache.add([1.0, 0.0, 0.0], "gpt-3.5-turbo", 150, make_response())
+
+    assert cache.get([0.99, 0.05, 0.0], "gpt-3.5-turbo", 150).response == "Hi!"
+    assert cache.get([0.7, 0.7, 0.0], "gpt-3.5-turbo", 150) is None
+    assert cache.hits == 1
+
+
+def test_semantic_cache_requires_matching_generation_settings(fake_hnswlib):
+    cache = main.SemanticCache()
+    cache.add([1.0, 0.0, 0.0], "gpt-3.5-turbo", 150, make_response())
+
+    assert cache.get([1.0, 0.0, 0.0], "gpt-4", 150) is None
+    assert cache.get([1.0, 0.0, 0.0], "gpt-3.5-turbo", 50) is None
+
+
+def test_semantic_cache_entry_expires(fake_hnswlib):
+    cache = main.SemanticCache(ttl_seconds=0)
+    cache.add([1.0, 0.0, 0.0], "gpt-3.5-turbo", 150, make_response())
+
+    assert cache.get([1.0, 0.0, 0.0], "gpt-3.5-turbo", 150) is None
+    assert len(cache._entries) == 0
+
+
+def test_semantic_cache_evicts_oldest_when_full(fake_hnswlib):
+    cache = main.SemanticCache(max_elements=2)
+    for vector, message in [([1.0, 0.0, 0.0], "a"), ([0.0, 1.0, 0.0], "b"), ([0.0, 0.0, 1.0], "c")]:
+        cache.add(vector, "gpt-3.5-turbo", 150, make_response(message))
+
+    assert cache.get([1.0, 0.0, 0.0], "gpt-3.5-turbo", 150) is None
+    assert cache.get([0.0, 0.0, 1.0], "gpt-3.5-turbo", 150).original_message == "c"
+
+
+def test_sse_iter_frames_deltas_and_caches_text():
+    stream = FakeStream([ChoiceDelta(role="assistant", content="Hi "), ChoiceDelta(content="there!")])
+    request = main.OpenAIChatRequest(message="Hello", temperature=0.0, stream=True)
+
+    events = collect(main.sse_iter(stream, request, "Hello", True))
+
+    assert events == [
+        b'data: {"content":"Hi ","role":"assistant"}\n\n',
+        b'data: {"content":"there!"}\n\n',
+        main.SSE_DONE
+    ]
+    assert stream.closed
+    cached = asyncio.run(main.cache.get(request.model, "Hello", request.max_tokens, request.temperature))
+    assert cached.response == "Hi there!"
+
+
+def test_sse_iter_reports_transport_errors_in_band():
+    stream = FakeStream([ChoiceDelta(content="Hi")], error=httpx.ReadTimeout("timed out"))
+    request = main.OpenAIChatRequest(message="Hello", stream=True)
+
+    events = collect(main.sse_iter(stream, request, "Hello", False))
+
+    assert events[-1].startswith(b"event: error\ndata: ")
+    assert main.SSE_DONE not in events
+    assert stream.closed
+
+
+def test_chat_matches_normalized_intents(client):
+    for message, expected in [(" HI ", "Hello! How can I help you?"), ("Hello", "Hello! How can I help you?"),
+                              ("How Are You", "I am fine"), ("ＢＹＥ", "Goodbye! Have a great day!")]:
+        response = client.post("/chat", json={"message": message})
+        assert response.status_code == 200
+        assert response.json() == {"response": expected, "original_message": message.strip()}
+
+
+def test_chat_matches_intents(client):
+    for message, expected in [("Hello", "Hello! How can I help you?"), ("hi", "Hello! How can I help you?"),
+                              ("how are you", "I am fine"), ("Goodbye", "Goodbye! Have a great day!")]:
+        assert client.post("/chat", json={"message": message}).json()["response"] == expected
+
+
+def test_chat_echoes_unmatched_message(client):
+    response = client.post("/chat", json={"message": "What's the weather like?"})
+    assert response.json()["response"] == "I received your message: 'What's the weather like?'. How can I assist you?"
+
+
+@pytest.mark.parametrize("path,payload", [
+    ("/chat", {"message": "Hello", "extra": 1}),
+    ("/chat", {"message": None}),
+    ("/chat/openai", {"message": "Hello", "max_tokens": None}),
+    ("/chat/openai", {"message": "Hello", "max_tokens": 0}),
+    ("/chat/openai", {"message": "Hello", "temperature": 3}),
+    ("/chat/openai", {"message": "Hello", "unknown": True})
+])
+def test_invalid_requests_are_rejected(client, path, payload):
+    assert client.post(path, json=payload).status_code == 422
+
+
+def test_openai_unavailable_without_api_key(client):
+    assert client.app.state.openai is None
+    assert client.post("/chat/openai", json={"message": "Hello"}).status_code == 503
+
+
+def test_openai_deterministic_responses_are_cached(client):
+    fake = FakeOpenAI()
+    client.app.state.openai = fake
+
+    first = client.post("/chat/openai", json={"message": "Hello", "temperature": 0})
+    second = client.post("/chat/openai", json={"message": " HELLO ", "temperature": 0})
+
+    assert first.json()["tokens_used"] == 12
+    assert second.json() == {"response": "Hi there!", "original_message": "HELLO", "model_used": "gpt-3.5-turbo", "tokens_used": 0}
+    assert fake.chat.completions.calls == 1
+
+
+def test_openai_streams_server_sent_events(client):
+    client.app.state.openai = FakeOpenAI()
+
+    response = client.post("/chat/openai", json={"message": "Hello", "stream": True})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.endswith("data: [DONE]\n\n")
+    assert 'data: {"content":"there!"}\n\n' in response.text
+
+
+def test_unexpected_errors_return_500(client):
+    client.app.state.openai = FakeOpenAI(content=None)
+
+    response = client.post("/chat/openai", json={"message": "Hello"})
+
+    assert response.status_code == 500
+    assert response.json()["error"] == "Internal server error"
+
+
+def test_health_is_answered_before_routing(client, monkeypatch):
+    route = next(r for r in client.app.routes if getattr(r, "path", None) == "/health")
+
+    def not_called(*args, **kwargs):
+        raise AssertionError("GET /health reached the route handler")
+
+    # The route's endpoint only runs if fast_health let the request through to routing
+    monkeypatch.setattr(route.dependant, "call", not_called)
+    response = client.get("/health")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+    assert response.json()["openai_status"] == "disabled"
+
+
+@pytest.fixture
+def semantic_client(monkeypatch, fake_hnswlib):
+    monkeypatch.setattr(main, "OPENAI_API_KEY", None)
+    monkeypatch.setattr(main, "REDIS_URL", None)
+    monkeypatch.setattr(main, "SEMANTIC_CACHE_ENABLED", True)
+    with TestClient(main.app, raise_server_exceptions=False) as test_client:
+        yield test_client
+
+
+def test_openai_serves_near_duplicate_prompts_from_semantic_cache(semantic_client):
+    fake = FakeOpenAI(vectors={"Hello there": [1.0, 0.0, 0.0], "Hello there!": [0.99, 0.02, 0.0]})
+    semantic_client.app.state.openai = fake
+
+    first = semantic_client.post("/chat/openai", json={"message": "Hello there", "temperature": 0})
+    second = semantic_client.post("/chat/openai", json={"message": "Hello there!", "temperature": 0})
+
+    assert first.json()["tokens_used"] == 12
+    assert second.json()["response"] == "Hi there!"
+    assert second.json()["original_message"] == "Hello there!"
+    assert second.json()["tokens_used"] == 0
+    assert fake.chat.completions.calls == 1
+    assert semantic_client.get("/health").json()["semantic_cache_hits"] == 1
+
+
+def test_openai_falls_back_when_embedding_fails(semantic_client):
+    error = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+    fake = FakeOpenAI(vectors={"Hello there": error})
+    semantic_client.app.state.openai = fake
+
+    for _ in range(2):
+        response = semantic_client.post("/chat/openai", json={"message": "Hello there", "temperature": 0})
+        assert response.status_code == 200
+
+    # The exact-match cache still answers the repeat even without an embedding
+    assert fake.chat.completions.calls == 1
+    assert semantic_client.app.state.semantic_cache.hits == 0